@@ -1,7 +1,12 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory, abort
 from config import Config
 from genius_helper import GeniusHelper
 from openai_processor import OpenAIProcessor
+from similarity_index import LyricsSimilarityIndex
+from load_controller import LoadController
+from profiler import ProfilingManager
+import hmac
+import math
 import uuid
 import time
 import json
@@ -17,11 +22,26 @@ os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 # Инициализация помощников
 genius = GeniusHelper()
 openai_processor = OpenAIProcessor()
+similarity_index = LyricsSimilarityIndex() if Config.SIMILARITY_ENABLED else None
+load_controller = LoadController()
+profiler = ProfilingManager(Config.PROFILING_DIR)
 
 # Простое хранилище задач
 tasks = {}
 
 
+# Отмечаем поток запроса для профилировщика
+@app.before_request
+def profiler_bind():
+    task_id = (request.view_args or {}).get('task_id')
+    profiler.bind(task_id, f"{request.method} {request.url_rule or request.path}")
+
+
+@app.teardown_request
+def profiler_unbind(error=None):
+    profiler.unbind()
+
+
 # Обработка favicon.ico
 @app.route('/favicon.ico')
 def favicon():
@@ -64,28 +84,43 @@ def search_song():
                 'error': 'Укажите исполнителя и название песни'
             }), 400
 
+        # Выбираем уровень качества или отклоняем запрос при перегрузке
+        tier = load_controller.admit()
+        if tier is None:
+            return jsonify({
+                'success': False,
+                'error': 'Сервис перегружен, попробуйте через минуту'
+            }), 503
+
         # Создаем уникальный ID задачи
         task_id = str(uuid.uuid4())
 
-        # Сохраняем задачу
-        tasks[task_id] = {
-            'id': task_id,
-            'artist': artist,
-            'title': title,
-            'status': 'searching',
-            'created_at': time.time(),
-            'step': 'Поиск текста на Genius...',
-            'progress': 10
-        }
-
-        # Запускаем обработку в фоне
-        import threading
-        thread = threading.Thread(
-            target=process_song,
-            args=(task_id, artist, title)
-        )
-        thread.daemon = True
-        thread.start()
+        # Слот занят в admit() - при любой ошибке до старта воркера освобождаем его
+        try:
+            # Сохраняем задачу
+            tasks[task_id] = {
+                'id': task_id,
+                'artist': artist,
+                'title': title,
+                'status': 'searching',
+                'created_at': time.time(),
+                'step': 'Поиск текста на Genius...',
+                'progress': 10,
+                'tier': tier
+            }
+
+            # Запускаем обработку в фоне
+            import threading
+            thread = threading.Thread(
+                target=process_song,
+                args=(task_id, artist, title)
+            )
+            thread.daemon = True
+            thread.start()
+        except Exception:
+            tasks.pop(task_id, None)
+            load_controller.release()
+            raise
 
         return jsonify({
             'success': True,
@@ -151,6 +186,24 @@ def api_status(task_id):
     })
 
 
+@app.route('/api/load')
+def api_load():
+    """API для мониторинга нагрузки и текущего уровня качества"""
+    return jsonify({
+        'success': True,
+        'load': load_controller.stats()
+    })
+
+
+@app.route('/api/cache')
+def api_cache():
+    """API со статистикой HTTP-кеша Genius"""
+    return jsonify({
+        'success': True,
+        'genius_cache': genius.http.stats()
+    })
+
+
 @app.route('/api/trending')
 def trending_songs():
     """Получить популярные песни для примера"""
@@ -174,17 +227,124 @@ def trending_songs():
         }), 500
 
 
+def is_admin():
+    """Проверка токена администратора из заголовка X-Admin-Token"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(Config.ADMIN_TOKEN) and hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+
+@app.route('/admin/profiling', methods=['GET'])
+def profiling_status():
+    """Состояние профилировщика"""
+    if not is_admin():
+        abort(404)
+
+    return jsonify({
+        'success': True,
+        'profiling': profiler.status()
+    })
+
+
+@app.route('/admin/profiling/start', methods=['POST'])
+def profiling_start():
+    """Запуск профилирования на время или для конкретной задачи"""
+    if not is_admin():
+        abort(404)
+
+    data = request.get_json(silent=True) or {}
+    task_id = data.get('task_id')
+
+    if task_id and task_id not in tasks:
+        return jsonify({
+            'success': False,
+            'error': 'Задача не найдена'
+        }), 404
+
+    if task_id and tasks[task_id]['status'] in ('completed', 'error'):
+        return jsonify({
+            'success': False,
+            'error': 'Задача уже завершена'
+        }), 409
+
+    try:
+        duration = float(data['duration']) if data.get('duration') else None
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'duration должен быть числом секунд'
+        }), 400
+
+    # NaN и бесконечность не дают сессии завершиться по таймеру
+    if duration is not None and (not math.isfinite(duration) or duration <= 0):
+        return jsonify({
+            'success': False,
+            'error': 'duration должен быть положительным конечным числом секунд'
+        }), 400
+
+    started = profiler.start(
+        duration=duration,
+        task_id=task_id,
+        memory=bool(data.get('memory'))
+    )
+
+    if started is None:
+        return jsonify({
+            'success': False,
+            'error': 'Профилирование уже запущено'
+        }), 409
+
+    # Задача могла завершиться между проверкой и запуском
+    if task_id and tasks[task_id]['status'] in ('completed', 'error'):
+        profiler.stop()
+
+    return jsonify({
+        'success': True,
+        'session': started
+    })
+
+
+@app.route('/admin/profiling/stop', methods=['POST'])
+def profiling_stop():
+    """Остановка профилирования и запись результатов"""
+    if not is_admin():
+        abort(404)
+
+    result = profiler.stop()
+    if result is None:
+        return jsonify({
+            'success': False,
+            'error': 'Профилирование не запущено'
+        }), 409
+
+    return jsonify({
+        'success': True,
+        'result': result
+    })
+
+
+@app.route('/admin/profiling/files/<path:filename>')
+def profiling_file(filename):
+    """Скачивание результатов для офлайн-анализа"""
+    if not is_admin():
+        abort(404)
+
+    return send_from_directory(os.path.abspath(Config.PROFILING_DIR), filename, as_attachment=True)
+
+
 # Фоновая обработка
 def process_song(task_id, artist, title):
     """Фоновая задача обработки песни"""
     task = tasks[task_id]
+    profiler.bind(task_id, f"worker {task_id}")
 
     try:
         # 1. Поиск текста на Genius
         task['step'] = 'Поиск текста на Genius...'
         task['progress'] = 20
 
+        stage_start = time.time()
         song_data = genius.search_song(artist, title)
+        load_controller.record('genius', time.time() - stage_start)
 
         if 'error' in song_data:
             task['status'] = 'error'
@@ -193,15 +353,45 @@ def process_song(task_id, artist, title):
 
         # 2. Сохраняем данные песни
         task.update(song_data)
+
+        # Кавер, ремикс или live-версия уже обработанной песни - берем готовый результат
+        if similarity_index:
+            match = similarity_index.find_similar(song_data['lyrics'])
+            # Результаты деградированных уровней не переиспользуем
+            if match and match.get('tier') == 'full':
+                task['tier'] = match['tier']
+                task['analysis'] = match['analysis']
+                task['generated_prompt'] = match['generated_prompt']
+                # Ссылки OpenAI временные - отдаем только локальную копию
+                task['image_url'] = match['local_image']
+                task['local_image'] = match['local_image']
+                task['revised_prompt'] = match.get('revised_prompt', '')
+                task['reused_from'] = {
+                    'artist': match['artist'],
+                    'title': match['title'],
+                    'similarity': match['similarity']
+                }
+                task['step'] = 'Готово!'
+                task['progress'] = 100
+                task['status'] = 'completed'
+                task['completed_at'] = time.time()
+                task['processing_time'] = task['completed_at'] - task['created_at']
+                print(f"Задача {task_id}: использован результат похожей песни "
+                      f"{match['artist']} - {match['title']} ({match['similarity']})")
+                return
+
         task['step'] = 'Анализ текста с помощью AI...'
         task['progress'] = 40
 
         # 3. Анализ текста через OpenAI
+        stage_start = time.time()
         analysis_result = openai_processor.analyze_lyrics(
             song_data['lyrics'],
             artist,
-            title
+            title,
+            tier=task['tier']
         )
+        load_controller.record('analysis', time.time() - stage_start, task['tier'])
 
         if not analysis_result.get('success'):
             task['status'] = 'error'
@@ -215,9 +405,12 @@ def process_song(task_id, artist, title):
         task['progress'] = 70
 
         # 5. Генерация изображения через DALL-E
+        stage_start = time.time()
         image_result = openai_processor.generate_image(
-            analysis_result['full_prompt']
+            analysis_result['full_prompt'],
+            tier=task['tier']
         )
+        load_controller.record('image', time.time() - stage_start, task['tier'])
 
         if not image_result.get('success'):
             task['status'] = 'error'
@@ -234,6 +427,18 @@ def process_song(task_id, artist, title):
         task['completed_at'] = time.time()
         task['processing_time'] = task['completed_at'] - task['created_at']
 
+        # Запоминаем результат для похожих песен (только полного качества)
+        if similarity_index and task['tier'] == 'full':
+            similarity_index.add(song_data['lyrics'], {
+                'tier': task['tier'],
+                'artist': task['artist'],
+                'title': task['title'],
+                'analysis': task['analysis'],
+                'generated_prompt': task['generated_prompt'],
+                'local_image': task['local_image'],
+                'revised_prompt': task['revised_prompt']
+            })
+
         # Логируем успех
         print(f"Задача {task_id} завершена успешно!")
 
@@ -242,6 +447,10 @@ def process_song(task_id, artist, title):
         task['error'] = f'Критическая ошибка: {str(e)}'
         print(f"Ошибка в задаче {task_id}: {e}")
 
+    finally:
+        load_controller.release()
+        profiler.unbind()
+
 
 @app.route('/about')
 def about():
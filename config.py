@@ -28,5 +28,32 @@ class Config:
     GENIUS_TIMEOUT = 10
     OPENAI_TIMEOUT = 30
 
+    # HTTP-кеш для Genius
+    GENIUS_CACHE_ENABLED = os.getenv('GENIUS_CACHE_ENABLED', 'True').lower() == 'true'
+    GENIUS_CACHE_DIR = os.path.join('data', 'http_cache')
+    GENIUS_CACHE_MAX_ENTRIES = int(os.getenv('GENIUS_CACHE_MAX_ENTRIES', '2000'))
+    GENIUS_CACHE_MAX_AGE = 7 * 24 * 3600  # неделя
+
     # Максимальное время выполнения задачи
-    TASK_TIMEOUT = 300  # 5 минут
\ No newline at end of file
+    TASK_TIMEOUT = 300  # 5 минут
+
+    # Индекс похожих песен (каверы, ремиксы, live-версии)
+    SIMILARITY_ENABLED = os.getenv('SIMILARITY_ENABLED', 'True').lower() == 'true'
+    SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', '0.85'))
+    SIMILARITY_INDEX_PATH = os.path.join('data', 'similarity_index.json')
+    SIMILARITY_MAX_ENTRIES = int(os.getenv('SIMILARITY_MAX_ENTRIES', '5000'))
+
+    # Профилирование по запросу (эндпоинты /admin/profiling отключены без токена)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    PROFILING_DIR = os.path.join('data', 'profiles')
+
+    # Адаптивное качество и сброс нагрузки
+    LOAD_ECONOMY_DEPTH = int(os.getenv('LOAD_ECONOMY_DEPTH', '5'))
+    LOAD_MINIMAL_DEPTH = int(os.getenv('LOAD_MINIMAL_DEPTH', '10'))
+    LOAD_MAX_ACTIVE_TASKS = int(os.getenv('LOAD_MAX_ACTIVE_TASKS', '20'))
+    LOAD_LATENCY_WINDOW = 300  # секунд
+    LOAD_STAGE_SLO = {  # секунд, p90
+        'genius': GENIUS_TIMEOUT,
+        'analysis': OPENAI_TIMEOUT,
+        'image': OPENAI_TIMEOUT * 2
+    }
\ No newline at end of file
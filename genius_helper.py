@@ -1,5 +1,6 @@
 import requests
 from config import Config
+from http_cache import HttpCache
 
 
 class GeniusHelper:
@@ -12,6 +13,8 @@ class GeniusHelper:
             "Authorization": f"Bearer {self.api_key}",
             "User-Agent": "MusicToImage/1.0"
         }
+        # Кеш ответов Genius: поиск и страницы с текстами
+        self.http = HttpCache(Config.GENIUS_CACHE_DIR, enabled=Config.GENIUS_CACHE_ENABLED)
 
     def search_song(self, artist, title):
         """
@@ -30,7 +33,7 @@ class GeniusHelper:
             search_url = f"{self.base_url}/search"
             params = {"q": search_query}
 
-            response = requests.get(
+            response = self.http.get(
                 search_url,
                 headers=self.headers,
                 params=params,
@@ -83,7 +86,7 @@ class GeniusHelper:
             str: Текст песни
         """
         try:
-            response = requests.get(song_url, timeout=10)
+            response = self.http.get(song_url, timeout=10)
             response.raise_for_status()
 
             # Ищем текст в HTML (упрощенный парсинг)
@@ -128,7 +131,7 @@ class GeniusHelper:
             search_url = f"{self.base_url}/search"
             params = {"q": artist}
 
-            response = requests.get(
+            response = self.http.get(
                 search_url,
                 headers=self.headers,
                 params=params,
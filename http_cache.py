@@ -0,0 +1,260 @@
+import os
+import gzip
+import time
+import hashlib
+import threading
+from urllib.parse import urlencode
+from email.utils import parsedate_to_datetime
+import requests
+from requests.structures import CaseInsensitiveDict
+from utilits.helpers import save_json, load_json
+from config import Config
+
+
+class HttpCache:
+    """Локальный HTTP-кеш с ревалидацией (ETag / If-Modified-Since) и сжатием на диске"""
+
+    # Заголовки, которые нужны для повторной отдачи ответа из кеша
+    STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date')
+
+    # Как часто (в сохранениях) проверять размер кеша
+    EVICT_EVERY = 50
+
+    def __init__(self, cache_dir, enabled=True, max_entries=None, max_age=None):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.max_entries = max_entries or Config.GENIUS_CACHE_MAX_ENTRIES
+        self.max_age = max_age or Config.GENIUS_CACHE_MAX_AGE
+
+        # Одна сессия - переиспользование соединений
+        self.session = requests.Session()
+
+        self._lock = threading.Lock()
+        self._stores = 0
+        self._stats = {
+            'hits': 0,
+            'revalidated': 0,
+            'misses': 0,
+            'stale_on_error': 0,
+            'bytes_saved': 0
+        }
+
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, url, headers=None, params=None, timeout=10):
+        """
+        GET-запрос через кеш
+
+        Args:
+            url (str): Адрес
+            headers (dict): Заголовки запроса
+            params (dict): Параметры строки запроса
+            timeout (int): Таймаут в секундах
+
+        Returns:
+            requests.Response: Ответ сервера или восстановленный из кеша
+        """
+        if not self.enabled:
+            return self.session.get(url, headers=headers, params=params, timeout=timeout)
+
+        key = self._key(url, params)
+        meta = self._load_meta(key)
+        # Слишком старые записи считаем отсутствующими
+        if meta and time.time() - meta.get('stored_at', 0) > self.max_age:
+            meta = None
+        body = self._load_body(key) if meta else None
+        if body is None:
+            meta = None
+
+        # 1. Свежая запись - сеть не нужна
+        if meta and time.time() < meta['expires_at']:
+            self._count('hits', len(body))
+            return self._build_response(meta, body)
+
+        # 2. Устаревшая запись - условный запрос
+        request_headers = dict(headers or {})
+        if meta:
+            if meta['headers'].get('ETag'):
+                request_headers['If-None-Match'] = meta['headers']['ETag']
+            if meta['headers'].get('Last-Modified'):
+                request_headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        try:
+            response = self.session.get(url, headers=request_headers, params=params, timeout=timeout)
+        except requests.exceptions.RequestException:
+            # Устаревшую копию отдаем, только если сервер это не запретил
+            stored_directives = self._cache_control(meta['headers']) if meta else {}
+            if meta and not ('must-revalidate' in stored_directives or 'no-cache' in stored_directives):
+                self._count('stale_on_error', len(body))
+                return self._build_response(meta, body)
+            raise
+
+        if response.status_code == 304 and meta:
+            # Обновляем срок жизни и валидаторы из ответа 304
+            for name in self.STORED_HEADERS:
+                if name in response.headers and name != 'Content-Type':
+                    meta['headers'][name] = response.headers[name]
+            meta['expires_at'] = self._expires_at(meta['headers'], response.headers.get('Age'))
+            meta['stored_at'] = time.time()
+            self._save_meta(key, meta)
+            self._count('revalidated', len(body))
+            return self._build_response(meta, body)
+
+        self._count('misses')
+        if response.status_code == 200:
+            self._store(key, response)
+        return response
+
+    def stats(self):
+        """Счетчики попаданий, промахов и сэкономленных байт"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, name, saved=0):
+        with self._lock:
+            self._stats[name] += 1
+            self._stats['bytes_saved'] += saved
+
+    def _key(self, url, params):
+        raw = url
+        if params:
+            raw += '?' + urlencode(sorted(params.items()))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, f"{key}.{suffix}")
+
+    def _load_meta(self, key):
+        try:
+            return load_json(self._path(key, 'json'))
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, key, meta):
+        try:
+            save_json(meta, self._path(key, 'json'))
+        except OSError as e:
+            print(f"Не удалось сохранить запись HTTP-кеша: {e}")
+
+    def _load_body(self, key):
+        try:
+            with gzip.open(self._path(key, 'body.gz'), 'rb') as f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def _store(self, key, response):
+        cache_control = self._cache_control(response.headers)
+        if 'no-store' in cache_control:
+            return
+
+        meta = {
+            'url': response.url,
+            'encoding': response.encoding,
+            'headers': {
+                name: response.headers[name]
+                for name in self.STORED_HEADERS if name in response.headers
+            }
+        }
+        meta['expires_at'] = self._expires_at(meta['headers'], response.headers.get('Age'))
+        meta['stored_at'] = time.time()
+
+        # Без валидаторов и без срока свежести запись никогда не пригодится
+        revalidatable = 'ETag' in meta['headers'] or 'Last-Modified' in meta['headers']
+        if not revalidatable and meta['expires_at'] <= time.time():
+            return
+
+        # Пишем во временный файл, чтобы параллельные потоки не прочитали половину
+        body_path = self._path(key, 'body.gz')
+        tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(response.content)
+            os.replace(tmp_path, body_path)
+        except OSError as e:
+            print(f"Не удалось сохранить ответ в HTTP-кеш: {e}")
+            return
+
+        self._save_meta(key, meta)
+
+        with self._lock:
+            self._stores += 1
+            evict = self._stores % self.EVICT_EVERY == 0
+        if evict:
+            self._evict()
+
+    def _evict(self):
+        """Удаляет устаревшие записи и самые старые сверх лимита"""
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    path = os.path.join(self.cache_dir, name)
+                    entries.append((os.path.getmtime(path), name[:-len('.json')]))
+        except OSError as e:
+            print(f"Не удалось прочитать HTTP-кеш: {e}")
+            return
+
+        entries.sort()
+        cutoff = time.time() - self.max_age
+        excess = len(entries) - self.max_entries
+
+        for i, (mtime, key) in enumerate(entries):
+            if mtime >= cutoff and i >= excess:
+                break
+            for suffix in ('json', 'body.gz'):
+                try:
+                    os.remove(self._path(key, suffix))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _cache_control(headers):
+        """Разбирает Cache-Control в словарь директив"""
+        directives = {}
+        for part in headers.get('Cache-Control', '').split(','):
+            name, _, value = part.strip().partition('=')
+            if name:
+                directives[name.lower()] = value.strip('"')
+        return directives
+
+    def _expires_at(self, headers, age=None):
+        """Момент, до которого ответ можно отдавать без ревалидации
+
+        age - заголовок Age ответа: сколько секунд ответ уже провел в кешах по пути
+        """
+        now = time.time()
+        cache_control = self._cache_control(headers)
+
+        if 'no-cache' in cache_control:
+            return now
+
+        if 'max-age' in cache_control:
+            try:
+                current_age = max(0, int(age)) if age else 0
+            except ValueError:
+                current_age = 0
+            try:
+                return now + int(cache_control['max-age']) - current_age
+            except ValueError:
+                return now
+
+        if headers.get('Expires'):
+            try:
+                return parsedate_to_datetime(headers['Expires']).timestamp()
+            except (TypeError, ValueError):
+                return now
+
+        # Нет указаний о свежести - всегда ревалидируем
+        return now
+
+    @staticmethod
+    def _build_response(meta, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = meta['url']
+        response.encoding = meta.get('encoding')
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response._content = body
+        return response
@@ -0,0 +1,140 @@
+import time
+import threading
+from collections import deque
+from config import Config
+
+
+# Уровни качества от лучшего к самому дешевому.
+# chat_model = None - анализ без OpenAI через PromptEngine.create_prompt
+QUALITY_TIERS = {
+    'full': {
+        'chat_model': 'gpt-4',
+        'image_model': 'dall-e-3',
+        'image_size': '1024x1024',
+        'image_quality': 'standard'
+    },
+    'economy': {
+        'chat_model': 'gpt-3.5-turbo',
+        'image_model': 'dall-e-3',
+        'image_size': '1024x1024',
+        'image_quality': 'standard'
+    },
+    'minimal': {
+        'chat_model': None,
+        'image_model': 'dall-e-2',
+        'image_size': '512x512',
+        'image_quality': None
+    }
+}
+
+TIER_ORDER = ['full', 'economy', 'minimal']
+
+
+class LoadController:
+    """Адаптивный выбор уровня качества и сброс нагрузки по очереди и задержкам
+
+    Задержки хранятся отдельно для каждой пары (этап, уровень). Давление по
+    задержкам считается только по замерам уровня full и этапов, не зависящих
+    от уровня (tier=None): дешевые уровни быстрее сами по себе и иначе
+    возвращали бы контроллер на full, вызывая колебания. Пока идет деградация,
+    новых замеров full нет - старые устаревают за LOAD_LATENCY_WINDOW,
+    и уровень восстанавливается, после чего задержки проверяются заново.
+    """
+
+    def __init__(self):
+        self.economy_depth = Config.LOAD_ECONOMY_DEPTH
+        self.minimal_depth = Config.LOAD_MINIMAL_DEPTH
+        self.max_active = Config.LOAD_MAX_ACTIVE_TASKS
+        self.stage_slo = Config.LOAD_STAGE_SLO
+        self.window = Config.LOAD_LATENCY_WINDOW
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._shed = 0
+        self._latencies = {}  # (этап, уровень) -> deque[(время, длительность)]
+        self._tier_counts = {name: 0 for name in TIER_ORDER}
+
+    def admit(self):
+        """
+        Решает, принимать ли новую задачу, и выбирает для нее уровень качества
+
+        Returns:
+            str: Название уровня или None, если задачу нужно отклонить
+        """
+        with self._lock:
+            if self._active >= self.max_active:
+                self._shed += 1
+                return None
+
+            tier = self._select_tier()
+            self._active += 1
+            self._tier_counts[tier] += 1
+            return tier
+
+    def release(self):
+        """Отмечает завершение задачи, принятой через admit()"""
+        with self._lock:
+            self._active = max(0, self._active - 1)
+
+    def record(self, stage, seconds, tier=None):
+        """Запоминает длительность этапа; tier=None - этап не зависит от уровня"""
+        now = time.time()
+        with self._lock:
+            samples = self._latencies.setdefault((stage, tier), deque(maxlen=100))
+            samples.append((now, seconds))
+
+    def stats(self):
+        """Текущее состояние для мониторинга"""
+        with self._lock:
+            return {
+                'active_tasks': self._active,
+                'max_active_tasks': self.max_active,
+                'current_tier': self._select_tier(),
+                'latency_pressure': round(self._latency_pressure(), 2),
+                'stage_p90': {
+                    f"{stage}/{tier}" if tier else stage: round(p90, 2)
+                    for (stage, tier), p90 in self._stage_p90().items()
+                },
+                'tier_counts': dict(self._tier_counts),
+                'shed_tasks': self._shed
+            }
+
+    def _select_tier(self):
+        # Уровень по глубине очереди
+        level = 0
+        if self._active >= self.minimal_depth:
+            level = 2
+        elif self._active >= self.economy_depth:
+            level = 1
+
+        # Уровень по задержкам последних задач
+        pressure = self._latency_pressure()
+        if pressure >= 1.5:
+            level = max(level, 2)
+        elif pressure >= 1.0:
+            level = max(level, 1)
+
+        return TIER_ORDER[level]
+
+    def _stage_p90(self):
+        cutoff = time.time() - self.window
+        result = {}
+        for key, samples in self._latencies.items():
+            # Старые замеры не учитываем - так уровень сам восстанавливается
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            if samples:
+                values = sorted(d for _, d in samples)
+                result[key] = values[int(0.9 * (len(values) - 1))]
+        return result
+
+    def _latency_pressure(self):
+        """Отношение p90 к SLO для самого перегруженного этапа (только уровень full)"""
+        pressure = 0.0
+        for (stage, tier), p90 in self._stage_p90().items():
+            if tier not in (None, 'full'):
+                continue
+            slo = self.stage_slo.get(stage)
+            if slo:
+                pressure = max(pressure, p90 / slo)
+        return pressure
@@ -1,6 +1,8 @@
 # openai_processor.py
 import openai
+import threading
 from config import Config
+from load_controller import QUALITY_TIERS
 
 
 class OpenAIProcessor:
@@ -14,9 +16,29 @@ class OpenAIProcessor:
         self.chat_model = "gpt-4"  # Или "gpt-4", если у тебя есть доступ
         self.image_model = "dall-e-3"
 
-    def analyze_lyrics(self, lyrics, artist, title):
+        # Локальный генератор промптов для режима перегрузки
+        self._prompt_engine = None
+        self._prompt_engine_lock = threading.Lock()
+
+    def _tier_settings(self, tier):
+        settings = QUALITY_TIERS.get(tier)
+        if settings is None:
+            settings = {
+                'chat_model': self.chat_model,
+                'image_model': self.image_model,
+                'image_size': "1024x1024",
+                'image_quality': "standard"
+            }
+        return settings
+
+    def analyze_lyrics(self, lyrics, artist, title, tier=None):
         """Анализ текста песни и создание промпта для изображения"""
         try:
+            settings = self._tier_settings(tier)
+
+            if settings['chat_model'] is None:
+                return self._analyze_offline(lyrics, artist, title)
+
             system_prompt = """Ты - эксперт по анализу текстов песен и созданию художественных образов.
             Проанализируй текст песни и создай детальное описание для генерации изображения.
 
@@ -37,7 +59,7 @@ class OpenAIProcessor:
             Проанализируй этот текст и создай детальное описание для изображения."""
 
             response = self.client.chat.completions.create(
-                model=self.chat_model,
+                model=settings['chat_model'],
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -63,16 +85,37 @@ class OpenAIProcessor:
                 'error': f'Ошибка анализа текста: {str(e)}'
             }
 
-    def generate_image(self, prompt):
+    def _analyze_offline(self, lyrics, artist, title):
+        """Промпт без обращения к чат-модели (PromptEngine)"""
+        # Модель настроения грузится один раз, даже если воркеров много
+        with self._prompt_engine_lock:
+            if self._prompt_engine is None:
+                from prompt_engine import PromptEngine
+                self._prompt_engine = PromptEngine(use_openai=False)
+
+        prompt = self._prompt_engine.create_prompt(lyrics, artist, title)
+
+        return {
+            'success': True,
+            'analysis': prompt,
+            'full_prompt': prompt
+        }
+
+    def generate_image(self, prompt, tier=None):
         """Генерация изображения через DALL-E"""
         try:
-            response = self.client.images.generate(
-                model=self.image_model,
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1
-            )
+            settings = self._tier_settings(tier)
+            params = {
+                'model': settings['image_model'],
+                'prompt': prompt,
+                'size': settings['image_size'],
+                'n': 1
+            }
+            # quality поддерживается только dall-e-3
+            if settings['image_quality']:
+                params['quality'] = settings['image_quality']
+
+            response = self.client.images.generate(**params)
 
             image_url = response.data[0].url
 
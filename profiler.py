@@ -0,0 +1,266 @@
+import os
+import sys
+import math
+import time
+import uuid
+import marshal
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+
+class ProfilingManager:
+    """Профилирование по запросу: семплирование стеков и снимки памяти tracemalloc
+
+    Семплируются только потоки, которые сейчас обрабатывают Flask-запрос
+    или фоновую задачу (см. bind/unbind). Время считается по настенным часам
+    (wall-clock): ожидание ответов Genius/OpenAI тоже попадает в tottime.
+    Результаты пишутся в форматах pstats (snakeviz, pstats.Stats)
+    и folded stacks (flamegraph.pl, speedscope).
+    """
+
+    def __init__(self, output_dir, interval=0.01, max_duration=600):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_duration = max_duration
+
+        self._lock = threading.Lock()
+        self._bound = {}  # ident потока -> (task_id, метка)
+        self._session = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._last_result = None
+
+    # Привязка потоков
+
+    def bind(self, task_id, label):
+        """Отмечает текущий поток как обрабатывающий запрос или задачу"""
+        self._bound[threading.get_ident()] = (task_id, label)
+
+        session = self._session
+        if session and task_id and session['task_id'] == task_id and label.startswith('worker'):
+            session['worker_seen'] = True
+
+    def unbind(self):
+        """Снимает отметку с текущего потока"""
+        task_id, _ = self._bound.pop(threading.get_ident(), (None, None))
+
+        # Профилируемая задача завершилась - заканчиваем сессию
+        session = self._session
+        if session and task_id and session['task_id'] == task_id and session['worker_seen']:
+            if not any(t == task_id for t, _ in self._bound.copy().values()):
+                self._stop_event.set()
+
+    # Управление сессией
+
+    def start(self, duration=None, task_id=None, memory=False):
+        """
+        Запускает сессию профилирования
+
+        Args:
+            duration (float): Длительность окна в секундах
+            task_id (str): Профилировать только эту задачу (до ее завершения)
+            memory (bool): Снимать снимки памяти через tracemalloc
+
+        Returns:
+            dict: Описание сессии или None, если сессия уже идет
+        """
+        with self._lock:
+            if self._session is not None:
+                return None
+
+            if not duration or not math.isfinite(duration) or duration <= 0:
+                duration = self.max_duration
+            duration = min(duration, self.max_duration)
+            started = time.time()
+            self._session = {
+                'id': f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}",
+                'task_id': task_id,
+                'memory': memory,
+                'started_at': started,
+                'deadline': started + duration,
+                # Воркер задачи мог привязаться еще до запуска сессии
+                'worker_seen': bool(task_id) and any(
+                    t == task_id and label.startswith('worker')
+                    for t, label in self._bound.copy().values()
+                ),
+                'samples': 0
+            }
+
+            if memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(25)
+                    self._session['own_tracemalloc'] = True
+                self._session['memory_start'] = tracemalloc.take_snapshot()
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, args=(self._session,))
+            self._thread.daemon = True
+            self._thread.start()
+
+            return self._describe(self._session)
+
+    def stop(self):
+        """
+        Останавливает текущую сессию и ждет записи результатов
+
+        Returns:
+            dict: Пути к файлам с результатами или None, если сессии нет
+        """
+        thread = self._thread
+        if thread is None:
+            return None
+
+        self._stop_event.set()
+        thread.join()
+        return self._last_result
+
+    def status(self):
+        """Состояние профилировщика и последний результат"""
+        session = self._session
+        return {
+            'active': session is not None,
+            'session': self._describe(session) if session else None,
+            'last_result': self._last_result
+        }
+
+    # Семплирование
+
+    def _run(self, session):
+        stacks = Counter()  # стек -> число семплов
+        weights = Counter()  # стек -> реально прошедшее время, сек
+        own_ident = threading.get_ident()
+
+        try:
+            # Цикл просыпается позже interval (ожидание, GIL, сам семплинг),
+            # поэтому каждый семпл весит фактическое время с предыдущего
+            previous = time.perf_counter()
+            while not self._stop_event.wait(self.interval):
+                if time.time() >= session['deadline']:
+                    break
+                now = time.perf_counter()
+                self._sample(session, stacks, weights, own_ident, now - previous)
+                previous = now
+
+            self._last_result = self._dump(session, stacks, weights)
+        except Exception as e:
+            self._last_result = {'error': f'Ошибка профилирования: {str(e)}'}
+            print(f"Ошибка профилирования: {e}")
+        finally:
+            if session.get('own_tracemalloc'):
+                tracemalloc.stop()
+            with self._lock:
+                self._session = None
+                self._thread = None
+
+    def _sample(self, session, stacks, weights, own_ident, elapsed):
+        bound = self._bound.copy()
+        frames = sys._current_frames()
+
+        for ident, (task_id, label) in bound.items():
+            if ident == own_ident or ident not in frames:
+                continue
+            if session['task_id'] and task_id != session['task_id']:
+                continue
+
+            stack = []
+            frame = frames[ident]
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack.reverse()
+
+            key = (label,) + tuple(stack)
+            stacks[key] += 1
+            weights[key] += elapsed
+            session['samples'] += 1
+
+    # Запись результатов
+
+    def _dump(self, session, stacks, weights):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = f"profile_{session['id']}"
+        if session['task_id']:
+            base += f"_{session['task_id'][:8]}"
+
+        result = {
+            'clock': 'wall',
+            'samples': session['samples'],
+            'duration': round(time.time() - session['started_at'], 2),
+            'files': {}
+        }
+
+        folded_path = os.path.join(self.output_dir, f"{base}.folded")
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.items():
+                frames = [stack[0]] + [f"{os.path.basename(fn)}:{name}" for fn, _, name in stack[1:]]
+                f.write(f"{';'.join(frames)} {count}\n")
+        result['files']['folded'] = os.path.basename(folded_path)
+
+        pstats_path = os.path.join(self.output_dir, f"{base}.pstats")
+        with open(pstats_path, 'wb') as f:
+            marshal.dump(self._to_pstats(stacks, weights), f)
+        result['files']['pstats'] = os.path.basename(pstats_path)
+
+        if session['memory']:
+            snapshot = tracemalloc.take_snapshot()
+
+            snapshot_path = os.path.join(self.output_dir, f"{base}.tracemalloc")
+            snapshot.dump(snapshot_path)
+            result['files']['tracemalloc'] = os.path.basename(snapshot_path)
+
+            # Топ роста памяти за время сессии в читаемом виде
+            top_path = os.path.join(self.output_dir, f"{base}_memory.txt")
+            diff = snapshot.compare_to(session['memory_start'], 'lineno')
+            with open(top_path, 'w', encoding='utf-8') as f:
+                for stat in diff[:50]:
+                    f.write(f"{stat}\n")
+            result['files']['memory_top'] = os.path.basename(top_path)
+
+        return result
+
+    def _to_pstats(self, stacks, weights):
+        """Переводит семплы в формат pstats: {func: (cc, nc, tt, ct, callers)}"""
+        stats = {}
+
+        def entry(func):
+            if func not in stats:
+                stats[func] = [0, 0, 0.0, 0.0, {}]
+            return stats[func]
+
+        for stack, count in stacks.items():
+            frames = list(stack[1:])
+            if not frames:
+                continue
+            weight = weights[stack]
+
+            # Собственное время - только у верхнего кадра
+            entry(frames[-1])[2] += weight
+
+            # Полное время - у каждой функции стека (рекурсию считаем один раз)
+            for func in set(frames):
+                data = entry(func)
+                data[0] += count
+                data[1] += count
+                data[3] += weight
+
+            for caller, callee in zip(frames, frames[1:]):
+                callers = entry(callee)[4]
+                nc, cc, tt, ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                tt_add = weight if callee == frames[-1] else 0.0
+                callers[caller] = (nc + count, cc + count, tt + tt_add, ct + weight)
+
+        return {func: tuple(data) for func, data in stats.items()}
+
+    @staticmethod
+    def _describe(session):
+        return {
+            'id': session['id'],
+            'task_id': session['task_id'],
+            'memory': session['memory'],
+            'started_at': session['started_at'],
+            'deadline': session['deadline'],
+            'samples': session['samples']
+        }
@@ -1,17 +1,18 @@
 import openai
-from transformers import pipeline
 from config import Config
 
 
 class PromptEngine:
-    def __init__(self):
-        self.use_openai = bool(Config.OPENAI_API_KEY)
+    def __init__(self, use_openai=None):
+        # use_openai=False - полностью локальный режим без запросов к OpenAI
+        self.use_openai = bool(Config.OPENAI_API_KEY) if use_openai is None else use_openai
 
         if self.use_openai:
             openai.api_key = Config.OPENAI_API_KEY
         else:
             # Локальные модели для анализа настроения
             try:
+                from transformers import pipeline
                 self.sentiment = pipeline(
                     "text-classification",
                     model="seara/rubert-tiny2-russian-sentiment"
@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import hashlib
+import random
+import threading
+from collections import deque
+from utilits.helpers import load_json
+from config import Config
+
+
+class LyricsSimilarityIndex:
+    """Локальный индекс похожих текстов песен (MinHash + LSH, только CPU)"""
+
+    # Простое число Мерсенна для универсального хеширования
+    _PRIME = (1 << 61) - 1
+    _MAX_HASH = (1 << 32) - 1
+
+    def __init__(self, path=None, threshold=None, max_entries=None, num_perm=128, bands=32, shingle_size=3):
+        self.path = path or Config.SIMILARITY_INDEX_PATH
+        self.threshold = Config.SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.max_entries = max_entries or Config.SIMILARITY_MAX_ENTRIES
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Фиксированный seed - сигнатуры должны совпадать между перезапусками
+        rng = random.Random(42)
+        self._perms = [
+            (rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME))
+            for _ in range(num_perm)
+        ]
+
+        self._lock = threading.Lock()
+        self._entries = {}  # id записи -> {'signature': [...], 'result': {...}}
+        self._order = deque()  # id записей от старых к новым
+        self._buckets = {}  # (номер полосы, хеш полосы) -> {id записей}
+        self._next_id = 0
+
+        # Запись на диск идет вне self._lock, чтобы не тормозить поиск
+        self._save_lock = threading.Lock()
+        self._version = 0
+        self._saved_version = 0
+        self._load()
+
+    def find_similar(self, lyrics):
+        """
+        Ищет ранее обработанную песню с почти таким же текстом
+
+        Args:
+            lyrics (str): Текст песни
+
+        Returns:
+            dict: Сохраненный результат с полем similarity или None
+        """
+        signature = self._signature(lyrics)
+        if signature is None:
+            return None
+
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+
+            best, best_score = None, 0.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                score = self._estimate(signature, entry['signature'])
+                if score > best_score:
+                    best, best_score = entry, score
+
+        if best is None or best_score < self.threshold:
+            return None
+
+        match = dict(best['result'])
+        match['similarity'] = round(best_score, 3)
+        return match
+
+    def add(self, lyrics, result):
+        """
+        Добавляет обработанную песню в индекс
+
+        Args:
+            lyrics (str): Текст песни
+            result (dict): Анализ, промпт и изображение для повторного использования
+        """
+        signature = self._signature(lyrics)
+        if signature is None:
+            return
+
+        with self._lock:
+            self._insert(signature, result)
+            self._version += 1
+            version = self._version
+            snapshot = [self._entries[entry_id] for entry_id in self._order]
+
+        self._save(version, snapshot)
+
+    def _insert(self, signature, result):
+        """Добавляет запись и вытесняет самые старые сверх лимита (под self._lock)"""
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = {'signature': signature, 'result': result}
+        self._order.append(entry_id)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(entry_id)
+
+        while len(self._order) > self.max_entries:
+            old_id = self._order.popleft()
+            old = self._entries.pop(old_id)
+            for key in self._band_keys(old['signature']):
+                bucket = self._buckets[key]
+                bucket.discard(old_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _save(self, version, entries):
+        """Атомарная запись снимка индекса на диск; более старые снимки пропускаем"""
+        with self._save_lock:
+            if version <= self._saved_version:
+                return
+
+            tmp_path = f"{self.path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'num_perm': self.num_perm, 'entries': entries}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._saved_version = version
+            except OSError as e:
+                print(f"Не удалось сохранить индекс похожих песен: {e}")
+
+    def _load(self):
+        try:
+            data = load_json(self.path)
+        except (OSError, ValueError) as e:
+            print(f"Не удалось загрузить индекс похожих песен: {e}")
+            return
+
+        if not data or data.get('num_perm') != self.num_perm:
+            return
+
+        for entry in data.get('entries', [])[-self.max_entries:]:
+            self._insert(entry['signature'], entry['result'])
+
+    def _shingles(self, lyrics):
+        """Множество n-грамм слов нормализованного текста"""
+        words = re.findall(r'\w+', lyrics.lower())
+        if len(words) < self.shingle_size:
+            return {' '.join(words)} if words else set()
+        return {
+            ' '.join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+    def _signature(self, lyrics):
+        shingles = self._shingles(lyrics or '')
+        if not shingles:
+            return None
+
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'big')
+            for s in shingles
+        ]
+        prime, max_hash = self._PRIME, self._MAX_HASH
+        return [
+            min(((a * h + b) % prime) & max_hash for h in hashes)
+            for a, b in self._perms
+        ]
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, tuple(signature[start:start + self.rows])
+
+    @staticmethod
+    def _estimate(sig_a, sig_b):
+        """Оценка коэффициента Жаккара по совпадению MinHash-сигнатур"""
+        same = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+        return same / len(sig_a)